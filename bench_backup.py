@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+LuxuryTrendBot - Backup Benchmark
+Measures backup time and its effect on handler p99 latency
+"""
+
+import os
+import gzip
+import json
+import time
+import random
+import asyncio
+import argparse
+import sqlite3
+import tempfile
+
+from backup import EXPORT_TABLES, HandlerLatency, backup_database, run_backup
+
+def build_database(db_path: str, users: int, offers: int, posts: int):
+    """Create a database shaped like luxurytrend.db"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''CREATE TABLE offers (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT,
+                        description TEXT, category TEXT, commission REAL, gravity REAL,
+                        affiliate_link TEXT, platform TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.execute('''CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        telegram_id INTEGER UNIQUE NOT NULL, username TEXT, first_name TEXT,
+                        referral_code TEXT UNIQUE, referred_by INTEGER,
+                        referral_count INTEGER DEFAULT 0, points INTEGER DEFAULT 0,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.execute('''CREATE TABLE posts_log (id INTEGER PRIMARY KEY AUTOINCREMENT, offer_id INTEGER,
+                        channel_id TEXT, message_id INTEGER,
+                        posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.executemany(
+            'INSERT INTO offers (title, description, category, commission, gravity, affiliate_link, platform) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((f"Offer {i}", "x" * 200, "Business", 99.0, 50.0, f"https://example.com/aff/{i}", "ClickBank")
+             for i in range(offers)))
+        conn.executemany(
+            'INSERT INTO users (telegram_id, username, first_name, referral_code) VALUES (?, ?, ?, ?)',
+            ((i, f"user{i}", f"User {i}", f"LUX{i:06d}") for i in range(users)))
+        conn.executemany(
+            'INSERT INTO posts_log (offer_id, channel_id, message_id) VALUES (?, ?, ?)',
+            ((i % offers + 1, "@channel", i) for i in range(posts)))
+
+async def handler_load(db_path: str, latency: HandlerLatency, users: int, stop: asyncio.Event):
+    """Simulate /start and /referral handlers hitting the database"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        telegram_id = random.randrange(users)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('SELECT * FROM users WHERE telegram_id = ?', (telegram_id,)).fetchone()
+            conn.execute('UPDATE users SET points = points + 1 WHERE telegram_id = ?', (telegram_id,))
+        latency.observe(time.perf_counter() - start)
+        await asyncio.sleep(0.002)
+
+async def run(args):
+    """Run handler load with and without a concurrent backup"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "luxurytrend.db")
+        build_database(db_path, args.users, args.offers, args.posts)
+        print(f"database: {os.path.getsize(db_path) / 1e6:.1f} MB")
+
+        latency = HandlerLatency(window=100000)
+        stop = asyncio.Event()
+        load = asyncio.create_task(handler_load(db_path, latency, args.users, stop))
+
+        await asyncio.sleep(args.warmup)
+        result = await run_backup(db_path, os.path.join(tmp, "backups"), latency,
+                                  pages=args.pages, pause=args.pause)
+        stop.set()
+        await load
+
+        print(f"backup:   {result['backup_seconds']:.2f}s ({args.pages} pages/step)")
+        print(f"export:   {result['export_seconds']:.2f}s {result['rows']}")
+        for phase in ("baseline", "backup", "export"):
+            p99 = result[f"{phase}_p99"]
+            value = f"{p99 * 1000:.2f}ms" if p99 is not None else "n/a"
+            print(f"p99 {phase + ':':9} {value} (n={result[f'{phase}_samples']})")
+
+async def check():
+    """Assert latency bookkeeping and a backup/export round-trip under writes"""
+    latency = HandlerLatency(window=3)
+    assert latency.p99() is None
+    for seconds in (1, 2, 3, 4, 5):
+        latency.observe(seconds)
+    assert latency.count == 5
+    assert latency.p99() == 5
+    assert latency.p99(since=5) is None
+    assert latency.p99(since=3) == 5
+    latency.observe(0)
+    assert latency.p99(since=5) == 0
+    assert latency.p99(since=0) == 5
+    assert latency.recent(since=4) == [5, 0]
+    assert latency.recent(since=0) == [4, 5, 0]
+    assert latency.recent() == [4, 5, 0]
+    latency = HandlerLatency()
+    for i in range(1, 201):
+        latency.observe(i)
+    assert latency.p99() == 199
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A failed backup leaves no temp file behind
+        bogus = os.path.join(tmp, "bogus.db")
+        with open(bogus, "w") as f:
+            f.write("not a database" * 100)
+        try:
+            backup_database(bogus, os.path.join(tmp, "bogus-backup.db"))
+            raise AssertionError("backup of a non-database succeeded")
+        except sqlite3.DatabaseError:
+            pass
+        assert os.listdir(tmp) == ["bogus.db"], os.listdir(tmp)
+
+        db_path = os.path.join(tmp, "luxurytrend.db")
+        build_database(db_path, 20000, 500, 20000)
+        backup_dir = os.path.join(tmp, "backups")
+
+        latency = HandlerLatency(window=100000)
+        stop = asyncio.Event()
+        load = asyncio.create_task(handler_load(db_path, latency, 20000, stop))
+        await asyncio.sleep(0.2)
+        first = await run_backup(db_path, backup_dir, latency, pages=8)
+        assert first["latency_mark"] <= latency.count
+        assert first["baseline_samples"] == first["latency_mark"] - first["backup_samples"] - first["export_samples"]
+        await asyncio.sleep(0.2)
+        # The baseline only covers samples since the previous run finished
+        idle = latency.count - first["latency_mark"]
+        result = await run_backup(db_path, backup_dir, latency, pages=8,
+                                  baseline_since=first["latency_mark"])
+        assert result["baseline_samples"] == idle > 0, (result, idle)
+        assert result["latency_mark"] == first["latency_mark"] + idle + result["backup_samples"] + result["export_samples"]
+        stop.set()
+        await load
+
+        assert sorted(os.listdir(backup_dir)) == ["export", "luxurytrend.db"], os.listdir(backup_dir)
+        backup_path = os.path.join(backup_dir, "luxurytrend.db")
+        conn = sqlite3.connect(backup_path)
+        try:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == "delete"
+            assert conn.execute('PRAGMA integrity_check').fetchone()[0] == "ok"
+            for table in EXPORT_TABLES:
+                count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                assert result["rows"][table] == count, (table, result["rows"], count)
+                with gzip.open(os.path.join(backup_dir, "export", f"{table}.jsonl.gz"), "rt") as f:
+                    rows = [json.loads(line) for line in f]
+                assert len(rows) == count
+        finally:
+            conn.close()
+        assert sorted(os.listdir(os.path.join(backup_dir, "export"))) == sorted(
+            f"{table}.jsonl.gz" for table in EXPORT_TABLES)
+    print("ok")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--offers", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=200000)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--pause", type=float, default=0.001)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--check", action="store_true", help="run self-checks and exit")
+    args = parser.parse_args()
+    asyncio.run(check() if args.check else run(args))
+
+if __name__ == "__main__":
+    main()
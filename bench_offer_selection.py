@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+LuxuryTrendBot - Offer Selection Benchmark
+Offline simulation comparing offer selection strategies
+"""
+
+import math
+import argparse
+import random
+import time
+
+from offer_selection import ThompsonOfferSelector
+
+def poisson(rng: random.Random, lam: float) -> int:
+    """Draw a Poisson count (normal approximation for large lam)"""
+    if lam > 50:
+        return max(0, round(rng.gauss(lam, math.sqrt(lam))))
+    limit, count, product = math.exp(-lam), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+def offer_rates(rng: random.Random, count: int, subscribers: int) -> list:
+    """Expected clicks per post: each subscriber clicks with the offer's CTR"""
+    # Most offers convert poorly, a few convert well
+    return [subscribers * rng.betavariate(1, 30) for _ in range(count)]
+
+def simulate(strategy: str, click_rates: list, rounds: int, seed: int) -> dict:
+    """Simulate posting `rounds` offers and return clicks and pick timing
+
+    Each post reaches the whole channel, so it collects a Poisson number of
+    clicks around the offer's expected clicks per post.
+    """
+    rng = random.Random(seed)
+    offer_ids = list(range(1, len(click_rates) + 1))
+
+    selector = ThompsonOfferSelector(rng=random.Random(seed))
+    selector.load((offer_id, 0, 0) for offer_id in offer_ids)
+
+    clicks = 0
+    pick_time = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if strategy == "thompson":
+            offer_id = selector.select()
+        else:
+            offer_id = rng.choice(offer_ids)
+        pick_time += time.perf_counter() - start
+
+        selector.record_post(offer_id)
+        for _ in range(poisson(rng, click_rates[offer_id - 1])):
+            selector.record_click(offer_id)
+            clicks += 1
+
+    best = max(click_rates)
+    return {
+        "clicks": clicks,
+        "per_post": clicks / rounds,
+        "regret": best * rounds - clicks,
+        "pick_us": pick_time / rounds * 1e6,
+    }
+
+def check():
+    """Assert selector bookkeeping and that Thompson beats random"""
+    selector = ThompsonOfferSelector(leaders=2, explore=1, rng=random.Random(0))
+    selector.load([(10, 5, 1), (20, 0, 0)])
+    selector.add_offer(30)
+    selector.add_offer(10)
+    assert len(selector) == 3
+    assert list(selector.offer_ids) == [10, 20, 30]
+    assert selector.slots == {10: 0, 20: 1, 30: 2}
+    assert (selector.total_posts, selector.total_clicks) == (5, 1)
+    assert selector.leaders == [0]
+
+    # Posts and clicks are counted independently, many clicks per post
+    selector.record_post(30)
+    for _ in range(4):
+        selector.record_click(30)
+    assert (selector.posts[2], selector.clicks[2]) == (1, 4)
+    assert (selector.total_posts, selector.total_clicks) == (6, 5)
+    assert selector.leaders == [0, 2]
+
+    # Posterior mean is clicks per post, shrunk towards the catalog rate
+    shape, rate = selector.prior()
+    assert (shape, rate) == (6 / 7, 1.0)
+    assert selector.mean(0) == (shape + 1) / (rate + 5)
+    assert selector.mean(2) == (shape + 4) / (rate + 1)
+
+    # A better offer displaces the weakest leader
+    for _ in range(3):
+        selector.record_post(20)
+        for _ in range(10):
+            selector.record_click(20)
+    assert sorted(selector.leaders) == [1, 2]
+
+    # Offers with the same click share but different post counts stay apart
+    ranked = ThompsonOfferSelector()
+    ranked.load([(1, 1, 50), (2, 10, 40)])
+    assert ranked.mean(0) > 5 * ranked.mean(1)
+    assert selector.select() in (10, 20, 30)
+    assert ThompsonOfferSelector().select() is None
+
+    rng = random.Random(42)
+    for count in (30, 1000):
+        click_rates = offer_rates(rng, count, 200)
+        baseline = simulate("random", click_rates, 20000, 42)
+        result = simulate("thompson", click_rates, 20000, 42)
+        assert result["clicks"] > 2 * baseline["clicks"], (count, result, baseline)
+    print("ok")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--offers", type=int, nargs="+", default=[30, 1000, 100000])
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--check", action="store_true", help="run self-checks and exit")
+    args = parser.parse_args()
+
+    if args.check:
+        check()
+        return
+
+    print(f"{'offers':>8} {'strategy':>9} {'clicks':>8} {'per_post':>8} {'regret':>9} {'pick_us':>8}")
+    for count in args.offers:
+        rng = random.Random(args.seed)
+        click_rates = offer_rates(rng, count, args.subscribers)
+        for strategy in ("random", "thompson"):
+            result = simulate(strategy, click_rates, args.rounds, args.seed)
+            print(f"{count:>8} {strategy:>9} {result['clicks']:>8} {result['per_post']:>8.2f} "
+                  f"{result['regret']:>9.0f} {result['pick_us']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
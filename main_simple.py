@@ -11,6 +11,8 @@ import logging
 import random
 import sqlite3
 import json
+import time
+import functools
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from dataclasses import dataclass, asdict
@@ -19,6 +21,8 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, ContextTypes
 from telegram.constants import ParseMode
 from dotenv import load_dotenv
+from backup import HandlerLatency, run_backup
+from offer_selection import SELECTION_STRATEGIES, ThompsonOfferSelector
 
 # Load environment variables
 load_dotenv()
@@ -28,6 +32,9 @@ TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 BOT_USERNAME = os.getenv('BOT_USERNAME', '@LuxuryTrendBot')
+OFFER_SELECTION_STRATEGY = os.getenv('OFFER_SELECTION_STRATEGY', 'random')
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_INTERVAL = os.getenv('BACKUP_INTERVAL', '86400')
 
 # Setup logging
 logging.basicConfig(
@@ -93,6 +100,9 @@ class Database:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
+                # WAL lets readers (and online backups) run alongside writers
+                cursor.execute('PRAGMA journal_mode=WAL')
+                
                 # Offers table
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS offers (
@@ -138,6 +148,28 @@ class Database:
                     )
                 ''')
                 
+                # Offer stats table (posts sent, distinct user clicks)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS offer_stats (
+                        offer_id INTEGER PRIMARY KEY,
+                        posts INTEGER DEFAULT 0,
+                        clicks INTEGER DEFAULT 0,
+                        FOREIGN KEY (offer_id) REFERENCES offers (id)
+                    )
+                ''')
+                
+                # Offer clicks table (one click per user per offer)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS offer_clicks (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        telegram_id INTEGER NOT NULL,
+                        offer_id INTEGER NOT NULL,
+                        clicked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE (telegram_id, offer_id),
+                        FOREIGN KEY (offer_id) REFERENCES offers (id)
+                    )
+                ''')
+                
                 conn.commit()
                 log.info("✅ Database initialized successfully")
                 
@@ -181,6 +213,77 @@ class Database:
             log.error(f"❌ Failed to get offers: {e}")
             return []
     
+    def get_offer(self, offer_id: int) -> Optional[Offer]:
+        """Get offer by ID"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM offers WHERE id = ?', (offer_id,))
+                row = cursor.fetchone()
+                
+                if row:
+                    return Offer(
+                        id=row[0], title=row[1], description=row[2], category=row[3],
+                        commission=row[4], gravity=row[5], affiliate_link=row[6], platform=row[7]
+                    )
+                return None
+        except Exception as e:
+            log.error(f"❌ Failed to get offer: {e}")
+            return None
+    
+    def get_offer_stats(self) -> List[tuple]:
+        """Get (offer_id, posts, clicks) for every offer"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT o.id, COALESCE(s.posts, 0), COALESCE(s.clicks, 0)
+                    FROM offers o LEFT JOIN offer_stats s ON s.offer_id = o.id
+                ''')
+                return cursor.fetchall()
+        except Exception as e:
+            log.error(f"❌ Failed to get offer stats: {e}")
+            return []
+    
+    def log_post(self, offer_id: int, channel_id: str, message_id: int) -> bool:
+        """Log a channel post and count it in the offer's stats"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO posts_log (offer_id, channel_id, message_id) VALUES (?, ?, ?)
+                ''', (offer_id, channel_id, message_id))
+                cursor.execute('''
+                    INSERT INTO offer_stats (offer_id, posts) VALUES (?, 1)
+                    ON CONFLICT(offer_id) DO UPDATE SET posts = posts + 1
+                ''', (offer_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            log.error(f"❌ Failed to log post: {e}")
+            return False
+    
+    def record_offer_click(self, telegram_id: int, offer_id: int) -> bool:
+        """Count a user's first click on an offer, returns True if counted"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR IGNORE INTO offer_clicks (telegram_id, offer_id) VALUES (?, ?)
+                ''', (telegram_id, offer_id))
+                if cursor.rowcount == 0:
+                    return False
+                
+                cursor.execute('''
+                    INSERT INTO offer_stats (offer_id, clicks) VALUES (?, 1)
+                    ON CONFLICT(offer_id) DO UPDATE SET clicks = clicks + 1
+                ''', (offer_id,))
+                conn.commit()
+                return True
+        except Exception as e:
+            log.error(f"❌ Failed to record offer click: {e}")
+            return False
+    
     def add_user(self, user: User) -> bool:
         """Add new user to database"""
         try:
@@ -388,6 +491,9 @@ class LuxuryTrendBot:
         self.db = Database()
         self.offer_generator = OfferGenerator()
         self.content_generator = ContentGenerator()
+        self.offer_selector = ThompsonOfferSelector()
+        self.handler_latency = HandlerLatency()
+        self.backup_latency_mark = None
         self.app = None
         
         # Validate environment variables
@@ -398,6 +504,26 @@ class LuxuryTrendBot:
         if not TELEGRAM_CHANNEL_ID:
             log.error("❌ TELEGRAM_CHANNEL_ID not found in environment variables")
             sys.exit(1)
+        
+        if OFFER_SELECTION_STRATEGY not in SELECTION_STRATEGIES:
+            log.error(f"❌ Unknown OFFER_SELECTION_STRATEGY: {OFFER_SELECTION_STRATEGY}")
+            sys.exit(1)
+        
+        if not BACKUP_INTERVAL.isdigit() or int(BACKUP_INTERVAL) == 0:
+            log.error(f"❌ BACKUP_INTERVAL must be a positive number of seconds: {BACKUP_INTERVAL}")
+            sys.exit(1)
+        self.backup_interval = int(BACKUP_INTERVAL)
+    
+    def timed(self, handler):
+        """Wrap a handler to record its latency"""
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            start = time.perf_counter()
+            try:
+                return await handler(update, context)
+            finally:
+                self.handler_latency.observe(time.perf_counter() - start)
+        return wrapper
     
     def generate_referral_code(self) -> str:
         """Generate unique referral code"""
@@ -455,6 +581,11 @@ class LuxuryTrendBot:
             self.db.add_user(new_user)
             existing_user = new_user
         
+        # Offer link clicked from a channel post
+        if referrer_code and referrer_code.startswith("OFFER") and referrer_code[5:].isdigit():
+            await self.send_offer_link(update, int(referrer_code[5:]))
+            return
+        
         # Welcome message
         keyboard = [
             [InlineKeyboardButton("🎯 Get My Referral Link", callback_data="get_referral")],
@@ -591,24 +722,62 @@ Hi {user.first_name}! 👋
 🚀 **Join the community and start earning!**"""
             await query.edit_message_text(stats_text, parse_mode=ParseMode.MARKDOWN)
     
+    async def send_offer_link(self, update: Update, offer_id: int):
+        """Send the affiliate link for an offer and record the user's first click"""
+        offer = self.db.get_offer(offer_id)
+        if not offer:
+            await update.message.reply_text("❌ This opportunity is no longer available")
+            return
+        
+        if self.db.record_offer_click(update.effective_user.id, offer.id):
+            self.offer_selector.record_click(offer.id)
+        
+        keyboard = [[InlineKeyboardButton("🔗 Get Instant Access", url=offer.affiliate_link)]]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            f"💎 **{offer.title}**\n\n📋 {offer.description}",
+            reply_markup=reply_markup,
+            parse_mode=ParseMode.MARKDOWN
+        )
+    
+    def select_offer(self) -> Optional[Offer]:
+        """Select next offer to post using OFFER_SELECTION_STRATEGY"""
+        if OFFER_SELECTION_STRATEGY == "thompson":
+            offer_id = self.offer_selector.select()
+            if offer_id is not None:
+                offer = self.db.get_offer(offer_id)
+                if offer:
+                    return offer
+        
+        offers = self.db.get_random_offers(1)
+        return offers[0] if offers else None
+    
     async def post_to_channel(self):
         """Post opportunity to channel"""
         try:
-            offers = self.db.get_random_offers(1)
-            if not offers:
+            offer = self.select_offer()
+            if not offer:
                 log.warning("⚠️ No offers available for posting")
                 return
             
-            offer = offers[0]
             content = self.content_generator.generate_post(offer)
             
+            offer_link = f"https://t.me/{BOT_USERNAME.replace('@', '')}?start=OFFER{offer.id}"
+            keyboard = [[InlineKeyboardButton("🔗 Get Instant Access", url=offer_link)]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
             # Send to channel
-            await self.app.bot.send_message(
+            message = await self.app.bot.send_message(
                 chat_id=TELEGRAM_CHANNEL_ID,
                 text=content,
+                reply_markup=reply_markup,
                 parse_mode=ParseMode.MARKDOWN
             )
             
+            self.db.log_post(offer.id, TELEGRAM_CHANNEL_ID, message.message_id)
+            self.offer_selector.record_post(offer.id)
+            
             log.info(f"✅ Posted offer to channel: {offer.title}")
             
         except Exception as e:
@@ -618,6 +787,27 @@ Hi {user.first_name}! 👋
         """Scheduled posting job"""
         await self.post_to_channel()
     
+    async def scheduled_backup(self, context: ContextTypes.DEFAULT_TYPE):
+        """Scheduled database backup and JSONL export job"""
+        try:
+            result = await run_backup(self.db.db_path, BACKUP_DIR, self.handler_latency,
+                                      baseline_since=self.backup_latency_mark)
+            self.backup_latency_mark = result['latency_mark']
+            
+            def p99(phase):
+                seconds = result[f"{phase}_p99"]
+                value = f"{seconds * 1000:.1f}ms" if seconds is not None else "n/a"
+                return f"{value} (n={result[f'{phase}_samples']})"
+            
+            log.info(f"💾 Backup done in {result['backup_seconds']:.2f}s, "
+                     f"export in {result['export_seconds']:.2f}s {result['rows']}")
+            log.info(f"⏱️ Handler p99: {p99('baseline')} before, "
+                     f"{p99('backup')} during backup, "
+                     f"{p99('export')} during export")
+        except Exception as e:
+            self.backup_latency_mark = self.handler_latency.count
+            log.error(f"❌ Backup failed: {e}")
+    
     def start_bot(self):
         """Start the bot"""
         try:
@@ -635,18 +825,22 @@ Hi {user.first_name}! 👋
                     self.db.add_offer(offer)
                 log.info(f"✅ Generated {len(offers)} initial offers")
             
+            # Load offer performance for the selection engine
+            self.offer_selector.load(self.db.get_offer_stats())
+            log.info(f"🎯 Offer selection: {OFFER_SELECTION_STRATEGY} ({len(self.offer_selector)} offers)")
+            
             # Create application
             self.app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
             
             # Add handlers
-            self.app.add_handler(CommandHandler("start", self.start_command))
-            self.app.add_handler(CommandHandler("referral", self.referral_command))
-            self.app.add_handler(CommandHandler("leaderboard", self.leaderboard_command))
-            self.app.add_handler(CommandHandler("help", self.help_command))
+            self.app.add_handler(CommandHandler("start", self.timed(self.start_command)))
+            self.app.add_handler(CommandHandler("referral", self.timed(self.referral_command)))
+            self.app.add_handler(CommandHandler("leaderboard", self.timed(self.leaderboard_command)))
+            self.app.add_handler(CommandHandler("help", self.timed(self.help_command)))
             
             # Add callback query handler
             from telegram.ext import CallbackQueryHandler
-            self.app.add_handler(CallbackQueryHandler(self.handle_callback_query))
+            self.app.add_handler(CallbackQueryHandler(self.timed(self.handle_callback_query)))
             
             # Schedule posts every 4 hours (only if job queue is available)
             if self.app.job_queue:
@@ -656,8 +850,15 @@ Hi {user.first_name}! 👋
                     first=60  # Start after 1 minute
                 )
                 log.info("🔄 Scheduled posts every 4 hours")
+                
+                self.app.job_queue.run_repeating(
+                    self.scheduled_backup,
+                    interval=self.backup_interval,
+                    first=300  # Start after 5 minutes
+                )
+                log.info(f"💾 Scheduled backups every {self.backup_interval}s to {BACKUP_DIR}/")
             else:
-                log.warning("⚠️ JobQueue not available, scheduled posts disabled")
+                log.warning("⚠️ JobQueue not available, scheduled posts and backups disabled")
             
             log.info("✅ LuxuryTrendBot started successfully!")
             log.info("🔄 Scheduled posts every 4 hours")
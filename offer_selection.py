@@ -0,0 +1,124 @@
+"""
+LuxuryTrendBot - Offer Selection
+Performance-driven offer ranking for channel posts
+"""
+
+import random
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SELECTION_STRATEGIES = ("random", "thompson")
+
+class ThompsonOfferSelector:
+    """Thompson sampling over per-offer click stats
+
+    A channel post reaches every subscriber, so one post can collect many
+    clicks. Clicks per post are modelled as Poisson with an unknown rate, and
+    each offer's posterior over that rate is Gamma(shape + clicks, rate +
+    posts). The empirical prior is worth one post at the catalog-wide clicks
+    per post, so untried offers look average. Stats live in flat arrays
+    indexed by slot, with a dict mapping offer id -> slot, so recording an
+    outcome is O(1).
+
+    A pick scores only a bounded sample of offers: the `leaders` best offers
+    by posterior mean, kept up to date as outcomes are recorded, plus
+    `explore` random slots. This keeps the cost of a pick constant as the
+    catalog grows without losing track of known-good offers.
+    """
+
+    def __init__(self, leaders: int = 16, explore: int = 16, rng: Optional[random.Random] = None):
+        self.max_leaders = leaders
+        self.explore = explore
+        self.rng = rng or random.Random()
+        self.offer_ids = array('q')
+        self.posts = array('q')
+        self.clicks = array('q')
+        self.slots: Dict[int, int] = {}
+        self.leaders: List[int] = []
+        self.total_posts = 0
+        self.total_clicks = 0
+
+    def __len__(self) -> int:
+        return len(self.offer_ids)
+
+    def load(self, stats: Iterable[Tuple[int, int, int]]):
+        """Load (offer_id, posts, clicks) rows, e.g. from Database.get_offer_stats"""
+        for offer_id, posts, clicks in stats:
+            slot = self._slot(offer_id)
+            self.total_posts += posts - self.posts[slot]
+            self.total_clicks += clicks - self.clicks[slot]
+            self.posts[slot] = posts
+            self.clicks[slot] = clicks
+            if posts:
+                self._promote(slot)
+
+    def add_offer(self, offer_id: int):
+        """Register an offer with no history"""
+        self._slot(offer_id)
+
+    def record_post(self, offer_id: int):
+        """Count one post for an offer"""
+        slot = self._slot(offer_id)
+        self.posts[slot] += 1
+        self.total_posts += 1
+        self._promote(slot)
+
+    def record_click(self, offer_id: int):
+        """Count one click for an offer"""
+        slot = self._slot(offer_id)
+        self.clicks[slot] += 1
+        self.total_clicks += 1
+        self._promote(slot)
+
+    def prior(self) -> Tuple[float, float]:
+        """Gamma(shape, rate) prior worth one post at the catalog-wide clicks per post"""
+        return (self.total_clicks + 1) / (self.total_posts + 1), 1.0
+
+    def mean(self, slot: int) -> float:
+        """Posterior mean clicks per post for a slot"""
+        shape, rate = self.prior()
+        return (shape + self.clicks[slot]) / (rate + self.posts[slot])
+
+    def select(self) -> Optional[int]:
+        """Pick the offer id with the highest sampled clicks per post"""
+        count = len(self.offer_ids)
+        if count == 0:
+            return None
+
+        if count <= self.max_leaders + self.explore:
+            candidates = range(count)
+        else:
+            candidates = set(self.leaders)
+            candidates.update(self.rng.randrange(count) for _ in range(self.explore))
+
+        shape, rate = self.prior()
+        gammavariate = self.rng.gammavariate
+        posts, clicks = self.posts, self.clicks
+        best_slot, best_score = 0, -1.0
+        for slot in candidates:
+            score = gammavariate(shape + clicks[slot], 1.0) / (rate + posts[slot])
+            if score > best_score:
+                best_slot, best_score = slot, score
+        return self.offer_ids[best_slot]
+
+    def _promote(self, slot: int):
+        """Add slot to the leaders if it beats the weakest one"""
+        leaders = self.leaders
+        if slot in leaders:
+            return
+        if len(leaders) < self.max_leaders:
+            leaders.append(slot)
+            return
+        weakest = min(range(len(leaders)), key=lambda i: self.mean(leaders[i]))
+        if self.mean(slot) > self.mean(leaders[weakest]):
+            leaders[weakest] = slot
+
+    def _slot(self, offer_id: int) -> int:
+        slot = self.slots.get(offer_id)
+        if slot is None:
+            slot = len(self.offer_ids)
+            self.slots[offer_id] = slot
+            self.offer_ids.append(offer_id)
+            self.posts.append(0)
+            self.clicks.append(0)
+        return slot